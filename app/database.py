@@ -2,6 +2,7 @@
 Database connection and session management with SQLAlchemy
 """
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
@@ -12,13 +13,25 @@ database_url = settings.database_url
 if database_url.startswith("postgresql://"):
     database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
 
+# Pool options: PgBouncer already pools server connections, so don't pool twice.
+# Its transaction mode also can't keep psycopg's automatic server-side
+# prepared statements, so those are turned off there.
+if settings.db_pgbouncer:
+    pool_options = {
+        "poolclass": NullPool,
+        "connect_args": {"prepare_threshold": None},
+    }
+else:
+    pool_options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,  # Verify connections before using
+    }
+
 # Create SQLAlchemy engine with psycopg3 driver
-engine = create_engine(
-    database_url,
-    pool_pre_ping=True,  # Verify connections before using
-    pool_size=5,
-    max_overflow=10
-)
+engine = create_engine(database_url, **pool_options)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -3,10 +3,12 @@ CheckInc ML Service - FastAPI Main Application
 Microservicio de Machine Learning para predicción de niveles de glucosa
 """
 from fastapi import FastAPI, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text, select, func, distinct
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timezone
+import asyncio
 import logging
 
 from .config import settings
@@ -41,11 +43,12 @@ app = FastAPI(
     
     * FastAPI + Python 3.10+
     * PostgreSQL Database
-    * Scikit-learn (Random Forest)
+    * Scikit-learn (Histogram Gradient Boosting)
     * SQLAlchemy ORM
     """,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -67,19 +70,34 @@ async def startup_event():
     """Execute on application startup"""
     logger.info("🚀 Starting CheckInc ML Service...")
     
-    # Create database tables if they don't exist
-    try:
-        create_tables()
-        logger.info("✓ Database tables verified/created")
-    except Exception as e:
-        logger.error(f"✗ Database initialization failed: {e}")
+    # Create database tables if they don't exist (skipped unless enabled, saves DDL round-trips)
+    if settings.auto_create_tables:
+        try:
+            create_tables()
+            logger.info("✓ Database tables verified/created")
+        except Exception as e:
+            logger.error(f"✗ Database initialization failed: {e}")
+    
+    # Load the ML model in a worker thread so the first request doesn't pay for it
+    from .ml.predictor import get_predictor, mark_model_load_failed
+    
+    def warm_up_model():
+        predictor = get_predictor()
+        if predictor.model is not None:
+            logger.info(f"✓ ML model loaded (version {predictor.model_version})")
+        else:
+            logger.warning("⚠ ML model not found - will need training")
+    
+    def on_warm_up_done(future: asyncio.Future):
+        # Surface load errors; prediction routes then retry instead of waiting
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            mark_model_load_failed(error)
+            logger.error(f"✗ ML model warm-up failed: {error!r}")
     
-    # Try to load ML model
-    from .ml.predictor import predictor
-    if predictor.model is not None:
-        logger.info(f"✓ ML model loaded (version {predictor.model_version})")
-    else:
-        logger.warning("⚠ ML model not found - will need training")
+    asyncio.get_running_loop().run_in_executor(None, warm_up_model).add_done_callback(on_warm_up_done)
     
     logger.info(f"✓ Service ready at {settings.api_v1_prefix}")
 
@@ -104,7 +122,7 @@ async def root():
 
 
 @app.get("/health", response_model=HealthResponse, tags=["health"])
-async def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_db)):
     """
     Health check endpoint for monitoring.
     
@@ -113,45 +131,50 @@ async def health_check(db: Session = Depends(get_db)):
     - Database connection is working
     - ML model is loaded
     """
-    from .ml.predictor import predictor
+    from .ml.predictor import get_predictor, MODEL_READY
     
     # Test database connection
     db_status = "connected"
     try:
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
     except Exception as e:
         db_status = f"error: {str(e)}"
     
-    # Check if model is loaded
-    model_loaded = predictor.model is not None
+    # Check if model is loaded (without waiting for a warm-up in progress)
+    model_loaded = MODEL_READY.is_set() and get_predictor().model is not None
     
     return HealthResponse(
         status="healthy" if db_status == "connected" else "unhealthy",
         version=settings.version,
         database=db_status,
         model_loaded=model_loaded,
-        timestamp=datetime.now()
+        timestamp=datetime.now(timezone.utc)
     )
 
 
 @app.get("/stats", tags=["statistics"])
-async def get_statistics(db: Session = Depends(get_db)):
+def get_statistics(db: Session = Depends(get_db)):
     """
     Get general statistics about the service.
     """
     from .models import GlucoseReading, Prediction, SyncLog
+    from .ml.predictor import get_predictor, MODEL_READY, MODEL_VERSION
     
-    total_readings = db.query(GlucoseReading).count()
-    total_predictions = db.query(Prediction).count()
-    total_users = db.query(GlucoseReading.user_id).distinct().count()
-    recent_syncs = db.query(SyncLog).count()
+    # All four counters in a single round-trip
+    row = db.execute(select(
+        select(func.count()).select_from(GlucoseReading).scalar_subquery().label("readings"),
+        select(func.count()).select_from(Prediction).scalar_subquery().label("predictions"),
+        select(func.count(distinct(GlucoseReading.user_id))).scalar_subquery().label("users"),
+        select(func.count()).select_from(SyncLog).scalar_subquery().label("syncs"),
+    )).one()
     
     return {
-        "total_glucose_readings": total_readings,
-        "total_predictions_made": total_predictions,
-        "unique_users": total_users,
-        "sync_operations": recent_syncs,
-        "model_version": "1.0.0"
+        "total_glucose_readings": row.readings,
+        "total_predictions_made": row.predictions,
+        "unique_users": row.users,
+        "sync_operations": row.syncs,
+        # Don't block on warm-up: report the current training version until loaded
+        "model_version": get_predictor().model_version if MODEL_READY.is_set() else MODEL_VERSION
     }
 
 
@@ -1,69 +1,242 @@
 """
 Machine Learning predictor for glucose levels
+
+pandas, scikit-learn and joblib are imported lazily inside the methods that
+need them so that importing this module (and the routers) stays cheap.
 """
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import joblib
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, NamedTuple, Optional, Tuple, TYPE_CHECKING
 import os
+import threading
+from cachetools import TTLCache
+from sqlalchemy import insert, select, func
 from sqlalchemy.orm import Session
 from ..models import GlucoseReading, Prediction
 from ..config import settings
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.base import RegressorMixin
+    from sklearn.preprocessing import StandardScaler
+
+# Columns read from glucose_readings to build feature frames
+_READING_COLUMNS = (
+    GlucoseReading.user_id,
+    GlucoseReading.glucose_level,
+    GlucoseReading.timestamp,
+    GlucoseReading.moment_of_day,
+)
+_READING_FIELDS = [c.key for c in _READING_COLUMNS]
+
+# Recent-window columns for a single user, all served by uq_reading_user_ts
+_RECENT_COLUMNS = (
+    GlucoseReading.glucose_level,
+    GlucoseReading.timestamp,
+    GlucoseReading.moment_of_day,
+)
+
+# Model input columns, in matrix order
+_FEATURE_COLUMNS = (
+    'hour_of_day', 'day_of_week', 'moment_encoded',
+    'avg_7d', 'std_7d', 'prev_reading', 'time_since_last'
+)
+
+# moment_of_day labels in encoding order (index = moment_encoded)
+_MOMENT_CATEGORIES = (
+    'En Ayuno',
+    'Antes de Desayuno',
+    'Después de Desayuno',
+    'Antes de Almuerzo',
+    'Después de Almuerzo',
+    'Antes de Cena',
+    'Después de Cena',
+)
+
+# Recent-reading feature frames per user: user_id -> (latest_timestamp, DataFrame)
+_user_feat_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+_user_feat_lock = threading.Lock()
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    """Drop cached features for a user (call after storing new readings)"""
+    with _user_feat_lock:
+        _user_feat_cache.pop(user_id, None)
+
+
+def _rolling_mean_std(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trailing rolling mean and sample std (ddof=1) with min_periods=1.
+    
+    Equivalent to Series.rolling(window, min_periods=1).mean() / .std().fillna(0),
+    computed in O(N) from cumulative sums instead of per-window passes.
+    """
+    n = values.shape[0]
+    end = np.arange(1, n + 1)
+    start = np.maximum(end - window, 0)
+    count = (end - start).astype(np.float64)
+    
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    csq = np.concatenate(([0.0], np.cumsum(values * values)))
+    total = csum[end] - csum[start]
+    total_sq = csq[end] - csq[start]
+    
+    mean = total / count
+    var = np.zeros(n, dtype=np.float64)
+    many = count > 1
+    # Clamp tiny negative values left by floating-point cancellation
+    var[many] = np.maximum(total_sq[many] - total[many] * mean[many], 0.0) / (count[many] - 1)
+    return mean, np.sqrt(var)
+
+
+def _feature_matrix(glucose: np.ndarray, timestamps: "pd.DatetimeIndex", moments: np.ndarray) -> np.ndarray:
+    """
+    Build the (N, 7) float32 feature matrix for readings sorted by time.
+    
+    Columns follow _FEATURE_COLUMNS; see GlucosePredictor.prepare_features.
+    """
+    import pandas as pd
+    
+    n = glucose.shape[0]
+    X = np.empty((n, len(_FEATURE_COLUMNS)), dtype=np.float32)
+    
+    # Time-based features
+    X[:, 0] = timestamps.hour
+    X[:, 1] = timestamps.dayofweek
+    
+    # Moment encoding (unknown/missing moments encode as 0)
+    codes = pd.Index(_MOMENT_CATEGORIES).get_indexer(moments)
+    X[:, 2] = np.where(codes < 0, 0, codes)
+    
+    # Rolling statistics (7 readings)
+    X[:, 3], X[:, 4] = _rolling_mean_std(glucose, window=7)
+    
+    # Previous reading (first row falls back to the mean)
+    X[0, 5] = glucose.mean()
+    X[1:, 5] = glucose[:-1]
+    
+    # Time since last reading (in hours, first row defaults to 24)
+    X[0, 6] = 24
+    X[1:, 6] = (timestamps[1:] - timestamps[:-1]).total_seconds().to_numpy() / 3600
+    
+    return X
+
+
+def _risk_statistics(levels: np.ndarray) -> Tuple[float, float, int, int]:
+    """
+    Mean, population std, hypoglycemia (<70) and hyperglycemia (>180) counts
+    of a float64 glucose array, in a fixed number of vectorised passes.
+    """
+    avg = levels.mean()
+    centered = levels - avg
+    std = np.sqrt(np.dot(centered, centered) / levels.size)
+    hypo = np.count_nonzero(levels < 70)
+    hyper = np.count_nonzero(levels > 180)
+    return float(avg), float(std), int(hypo), int(hyper)
+
+
+# Version stamped on models trained by this code (1.0.0 = legacy RandomForest)
+MODEL_VERSION = "2.0.0"
+
+
+class LoadedModel(NamedTuple):
+    """
+    Estimator with the artifacts it was trained with.
+    
+    Published as one object so a concurrent retrain can never pair a new
+    model with an old scaler or version.
+    """
+    model: Optional["RegressorMixin"]
+    # Trees are scale-invariant; a scaler is only kept for models saved before it was dropped
+    scaler: Optional["StandardScaler"]
+    version: str
+
 
 class GlucosePredictor:
     """
-    Predicts future glucose levels using Random Forest Regressor.
+    Predicts future glucose levels using a histogram-based Gradient Boosting Regressor.
     Uses historical data to make predictions.
     """
     
     
     def __init__(self, ml_model_path: str = None):
         self.ml_model_path = ml_model_path or settings.ml_model_path
-        self.model: Optional[RandomForestRegressor] = None
-        self.scaler: Optional[StandardScaler] = None
-        self.model_version = "1.0.0"
+        self.loaded = LoadedModel(None, None, MODEL_VERSION)
         
         # Try to load existing model
         if os.path.exists(self.ml_model_path):
             self.load_model()
         else:
             # Initialize new model
-            self.model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42,
-                n_jobs=-1
-            )
-            self.scaler = StandardScaler()
+            self.loaded = LoadedModel(self._build_model(), None, MODEL_VERSION)
+    
+    # Read-only views of the current snapshot; replace self.loaded to change them
+    
+    @property
+    def model(self) -> Optional["RegressorMixin"]:
+        return self.loaded.model
+    
+    @property
+    def scaler(self) -> Optional["StandardScaler"]:
+        return self.loaded.scaler
+    
+    @property
+    def model_version(self) -> str:
+        return self.loaded.version
+    
+    @staticmethod
+    def _build_model(n_samples: Optional[int] = None) -> "RegressorMixin":
+        """
+        Create an untrained estimator.
+        
+        Args:
+            n_samples: Training set size. Small (per-user) sets get smaller
+                leaves: with the default of 20, 30-39 rows allow no split and
+                the model degenerates to a constant.
+        """
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        
+        min_samples_leaf = 20 if n_samples is None else min(20, max(2, n_samples // 10))
+        return HistGradientBoostingRegressor(
+            max_iter=200,
+            max_depth=6,
+            learning_rate=0.05,
+            min_samples_leaf=min_samples_leaf,
+            early_stopping='auto',  # Enabled automatically on large datasets (>10k rows)
+            random_state=42
+        )
     
     def load_model(self):
         """Load trained model from disk"""
+        import joblib
+        
         try:
             data = joblib.load(self.ml_model_path)
-            self.model = data['model']
-            self.scaler = data['scaler']
-            self.model_version = data.get('version', '1.0.0')
+            self.loaded = LoadedModel(data['model'], data.get('scaler'), data.get('version', '1.0.0'))
             print(f"✓ Model loaded from {self.ml_model_path}")
         except Exception as e:
             print(f"⚠ Could not load model: {e}")
-            self.model = None
-            self.scaler = None
+            self.loaded = LoadedModel(None, None, self.loaded.version)
     
     def save_model(self):
         """Save trained model to disk"""
+        import joblib
+        
         os.makedirs(os.path.dirname(self.ml_model_path), exist_ok=True)
-        joblib.dump({
-            'model': self.model,
-            'scaler': self.scaler,
-            'version': self.model_version
-        }, self.ml_model_path)
+        loaded = self.loaded
+        data = {
+            'model': loaded.model,
+            'version': loaded.version
+        }
+        if loaded.scaler is not None:
+            data['scaler'] = loaded.scaler
+        # Write to a temp file and swap it in, so readers never see a partial pickle
+        tmp_path = f"{self.ml_model_path}.{os.getpid()}.tmp"
+        joblib.dump(data, tmp_path)
+        os.replace(tmp_path, self.ml_model_path)
         print(f"✓ Model saved to {self.ml_model_path}")
     
-    def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def prepare_features(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """
         Extract features from glucose readings dataframe.
         
@@ -76,37 +249,20 @@ class GlucosePredictor:
         - prev_reading: previous glucose level
         - time_since_last: hours since last reading
         """
-        df = df.copy()
-        df = df.sort_values('timestamp')
+        import pandas as pd
         
-        # Time-based features
-        df['hour_of_day'] = df['timestamp'].dt.hour
-        df['day_of_week'] = df['timestamp'].dt.dayofweek
-        
-        # Moment encoding
-        moment_mapping = {
-            'En Ayuno': 0,
-            'Antes de Desayuno': 1,
-            'Después de Desayuno': 2,
-            'Antes de Almuerzo': 3,
-            'Después de Almuerzo': 4,
-            'Antes de Cena': 5,
-            'Después de Cena': 6
-        }
-        df['moment_encoded'] = df['moment_of_day'].map(moment_mapping).fillna(0)
-        
-        # Rolling statistics (7 days)
-        df['avg_7d'] = df['glucose_level'].rolling(window=7, min_periods=1).mean()
-        df['std_7d'] = df['glucose_level'].rolling(window=7, min_periods=1).std().fillna(0)
-        
-        # Previous reading
-        df['prev_reading'] = df['glucose_level'].shift(1).fillna(df['glucose_level'].mean())
+        df = df.sort_values('timestamp')
+        timestamps = pd.DatetimeIndex(df['timestamp'])
+        glucose = df['glucose_level'].to_numpy(np.float64)
+        X = _feature_matrix(glucose, timestamps, df['moment_of_day'].to_numpy())
         
-        # Time since last reading (in hours)
-        df['time_since_last'] = df['timestamp'].diff().dt.total_seconds() / 3600
-        df['time_since_last'] = df['time_since_last'].fillna(24)
+        # Single DataFrame build; small ints for calendar features, float32 for the rest
+        columns = {col: df[col] for col in df.columns}
+        columns['glucose_level'] = glucose.astype(np.float32)
+        for i, col in enumerate(_FEATURE_COLUMNS):
+            columns[col] = X[:, i].astype(np.int8) if i < 3 else X[:, i]
         
-        return df
+        return pd.DataFrame(columns, index=df.index)
     
     def train(self, db: Session, user_id: int = None) -> Dict:
         """
@@ -119,52 +275,42 @@ class GlucosePredictor:
         Returns:
             Dictionary with training metrics
         """
-        # Fetch historical data
-        query = db.query(GlucoseReading)
+        import pandas as pd
+        
+        # Fetch historical data (plain rows, no ORM instances)
+        stmt = select(*_READING_COLUMNS)
         if user_id:
-            query = query.filter(GlucoseReading.user_id == user_id)
+            stmt = stmt.where(GlucoseReading.user_id == user_id)
         
-        readings = query.order_by(GlucoseReading.timestamp).all()
+        rows = db.execute(stmt.order_by(GlucoseReading.timestamp)).all()
         
-        if len(readings) < settings.min_training_samples:
+        if len(rows) < settings.min_training_samples:
             return {
                 'status': 'insufficient_data',
-                'message': f'Need at least {settings.min_training_samples} readings, got {len(readings)}'
+                'message': f'Need at least {settings.min_training_samples} readings, got {len(rows)}'
             }
         
         # Convert to DataFrame
-        data = [{
-            'user_id': r.user_id,
-            'glucose_level': r.glucose_level,
-            'timestamp': r.timestamp,
-            'moment_of_day': r.moment_of_day
-        } for r in readings]
-        
-        df = pd.DataFrame(data)
+        df = pd.DataFrame.from_records(rows, columns=_READING_FIELDS)
         
         # Prepare features
         df = self.prepare_features(df)
         
-        # Feature columns
-        feature_cols = [
-            'hour_of_day', 'day_of_week', 'moment_encoded',
-            'avg_7d', 'std_7d', 'prev_reading', 'time_since_last'
-        ]
-        
-        X = df[feature_cols].values
-        y = df['glucose_level'].values
+        X = df[list(_FEATURE_COLUMNS)].to_numpy(dtype=np.float32)
+        y = df['glucose_level'].to_numpy()
         
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Train model
-        self.model.fit(X_scaled, y)
+        # Train a fresh model (on raw features, so any legacy scaler no longer applies)
+        model = self._build_model(len(X))
+        model.fit(X, y)
         
         # Calculate metrics
-        train_score = self.model.score(X_scaled, y)
-        predictions = self.model.predict(X_scaled)
+        train_score = model.score(X, y)
+        predictions = model.predict(X)
         mae = np.mean(np.abs(predictions - y))
         
+        # Publish model, scaler and version in a single assignment
+        self.loaded = LoadedModel(model, None, MODEL_VERSION)
+        
         # Save model
         self.save_model()
         
@@ -176,11 +322,54 @@ class GlucosePredictor:
             'model_version': self.model_version
         }
     
+    def _recent_features(self, db: Session, user_id: int) -> Tuple[np.ndarray, Dict]:
+        """
+        Feature matrix built from the user's last 30 readings.
+        
+        Returns (features, meta) where features follows _FEATURE_COLUMNS and
+        meta holds 'last_timestamp' and 'last_glucose'. Cached per user for a
+        short TTL; the entry is reused only while the user's latest reading
+        timestamp is unchanged.
+        """
+        import pandas as pd
+        
+        latest = db.execute(
+            select(func.max(GlucoseReading.timestamp))
+            .where(GlucoseReading.user_id == user_id)
+        ).scalar()
+        
+        with _user_feat_lock:
+            cached = _user_feat_cache.get(user_id)
+        if cached is not None and latest is not None and cached[0] == latest:
+            return cached[1]
+        
+        # Get recent readings for this user (index-only scan on uq_reading_user_ts)
+        rows = db.execute(
+            select(*_RECENT_COLUMNS)
+            .where(GlucoseReading.user_id == user_id)
+            .order_by(GlucoseReading.timestamp.desc())
+            .limit(30)
+        ).all()
+        
+        if len(rows) < 5:
+            raise ValueError(f"Insufficient data for user {user_id}. Need at least 5 readings.")
+        
+        # Oldest first, straight into NumPy (no DataFrame on the serving path)
+        levels, stamps, moments = zip(*rows[::-1])
+        glucose = np.asarray(levels, dtype=np.float64)
+        features = _feature_matrix(glucose, pd.DatetimeIndex(stamps), np.asarray(moments, dtype=object))
+        meta = {'last_timestamp': stamps[-1], 'last_glucose': float(glucose[-1])}
+        
+        with _user_feat_lock:
+            _user_feat_cache[user_id] = (latest, (features, meta))
+        return features, meta
+    
     def predict_next_hours(
         self, 
         db: Session, 
         user_id: int, 
-        hours_ahead: int = 6
+        hours_ahead: int = 6,
+        loaded: Optional[LoadedModel] = None
     ) -> List[Dict]:
         """
         Predict glucose levels for the next N hours.
@@ -189,121 +378,131 @@ class GlucosePredictor:
             db: Database session
             user_id: User ID to predict for
             hours_ahead: Number of hours to predict (1-24)
+            loaded: Model snapshot to use (default: the current one); pass it
+                to report the same model_version the predictions came from
         
         Returns:
             List of predictions with timestamps and confidence scores
         """
-        if self.model is None:
+        # One snapshot for the whole call, even if a retrain lands meanwhile
+        if loaded is None:
+            loaded = self.loaded
+        if loaded.model is None:
             raise ValueError("Model not trained yet. Call train() first.")
         
-        # Get recent readings for this user
-        recent_readings = db.query(GlucoseReading)\
-            .filter(GlucoseReading.user_id == user_id)\
-            .order_by(GlucoseReading.timestamp.desc())\
-            .limit(30)\
-            .all()
-        
-        if len(recent_readings) < 5:
-            raise ValueError(f"Insufficient data for user {user_id}. Need at least 5 readings.")
-        
-        # Convert to DataFrame
-        data = [{
-            'user_id': r.user_id,
-            'glucose_level': r.glucose_level,
-            'timestamp': r.timestamp,
-            'moment_of_day': r.moment_of_day
-        } for r in reversed(recent_readings)]
-        
-        df = pd.DataFrame(data)
-        df = self.prepare_features(df)
+        features, meta = self._recent_features(db, user_id)
         
         # Get last reading info
-        last_reading = df.iloc[-1]
-        last_timestamp = last_reading['timestamp']
-        last_glucose = last_reading['glucose_level']
-        
-        # Generate predictions
-        predictions = []
+        last_ts = meta['last_timestamp']
+        last_glucose = meta['last_glucose']
+        avg7 = float(features[-1, 3])
+        std7 = float(features[-1, 4])
+
+        future_times = [last_ts + timedelta(hours=h) for h in range(1, hours_ahead + 1)]
+
+        # Feature matrix: every column except prev_reading is known up front
+        feat = np.empty((hours_ahead, 7), dtype=np.float32)
+        feat[:, 0] = np.fromiter((t.hour for t in future_times), dtype=np.float32, count=hours_ahead)  # hour_of_day
+        feat[:, 1] = np.fromiter((t.weekday() for t in future_times), dtype=np.float32, count=hours_ahead)  # day_of_week
+        feat[:, 2] = 0  # moment_encoded (unknown)
+        feat[:, 3] = avg7  # avg_7d
+        feat[:, 4] = std7  # std_7d
+        feat[:, 6] = 1.0  # time_since_last (1 hour)
+
+        # Autoregressive loop: prev_reading is the previous step's prediction
+        predicted = np.empty(hours_ahead, dtype=np.float64)
         current_glucose = last_glucose
+        predict = loaded.model.predict
         
-        for hour in range(1, hours_ahead + 1):
-            future_time = last_timestamp + timedelta(hours=hour)
-            
-            # Create feature vector
-            features = np.array([[
-                future_time.hour,  # hour_of_day
-                future_time.weekday(),  # day_of_week
-                0,  # moment_encoded (unknown)
-                df['avg_7d'].iloc[-1],  # avg_7d
-                df['std_7d'].iloc[-1],  # std_7d
-                current_glucose,  # prev_reading
-                1  # time_since_last (1 hour)
-            ]])
-            
-            # Scale and predict
-            features_scaled = self.scaler.transform(features)
-            predicted_level = self.model.predict(features_scaled)[0]
-            
-            # Calculate confidence (simplified)
-            confidence = max(0.5, 1.0 - (hour * 0.05))  # Decreases with time
-            
-            predictions.append({
+        # Legacy models: standardize in place with the fitted parameters, skipping transform()'s validation
+        scaler = loaded.scaler
+        scaled = np.empty((1, 7), dtype=np.float32) if scaler is not None else None
+
+        for i in range(hours_ahead):
+            feat[i, 5] = current_glucose  # prev_reading
+            features = feat[i:i + 1]
+            if scaled is not None:
+                np.subtract(features, scaler.mean_, out=scaled)
+                scaled /= scaler.scale_
+                features = scaled
+            current_glucose = predict(features)[0]
+            predicted[i] = current_glucose
+
+        # Calculate confidence (simplified): decreases with time, floored at 0.5
+        confidences = np.maximum(0.5, 1.0 - np.arange(1, hours_ahead + 1) * 0.05).round(2)
+
+        # Generate predictions
+        predictions = [
+            {
                 'timestamp': future_time,
-                'predicted_level': round(float(predicted_level), 2),
-                'confidence_score': round(confidence, 2)
-            })
-            
-            # Update for next iteration
-            current_glucose = predicted_level
-        
-        # Save predictions to database
-        for pred in predictions:
-            db_prediction = Prediction(
-                user_id=user_id,
-                predicted_level=pred['predicted_level'],
-                prediction_for_timestamp=pred['timestamp'],
-                confidence_score=pred['confidence_score'],
-                model_version=self.model_version
-            )
-            db.add(db_prediction)
+                'predicted_level': round(float(predicted[i]), 2),
+                'confidence_score': float(confidences[i])
+            }
+            for i, future_time in enumerate(future_times)
+        ]
         
+        # Save predictions to database (single bulk INSERT, bypasses the unit of work)
+        db.execute(insert(Prediction), [
+            {
+                'user_id': user_id,
+                'predicted_level': pred['predicted_level'],
+                'prediction_for_timestamp': pred['timestamp'],
+                'confidence_score': pred['confidence_score'],
+                'model_version': loaded.version
+            }
+            for pred in predictions
+        ])
         db.commit()
         
         return predictions
     
-    def assess_risk(self, db: Session, user_id: int) -> Dict:
+    # The risk/recommendation helpers below use only the database, never the
+    # model, so they are static: routes can call them before warm-up finishes.
+    
+    @staticmethod
+    def recent_levels(db: Session, user_id: int) -> np.ndarray:
         """
-        Assess current risk level based on recent readings.
+        Glucose levels of the user's last 30 days of readings, as float64.
         
-        Returns:
-            Dictionary with risk level, score, and details
+        This is the window assess_risk() works on; callers that also need
+        the readings count can load it once and pass it in.
         """
-        # Get last 30 days of readings
-        cutoff_date = datetime.now() - timedelta(days=30)
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=30)
         
-        readings = db.query(GlucoseReading)\
-            .filter(
+        return np.fromiter(db.execute(
+            select(GlucoseReading.glucose_level).where(
                 GlucoseReading.user_id == user_id,
                 GlucoseReading.timestamp >= cutoff_date
-            )\
-            .all()
+            )
+        ).scalars(), dtype=np.float64)
+    
+    @staticmethod
+    def assess_risk(
+        db: Session,
+        user_id: int,
+        levels: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        Assess current risk level based on recent readings.
+        
+        Args:
+            levels: Preloaded recent_levels() for this user, if available
+        
+        Returns:
+            Dictionary with risk level, score, and details
+        """
+        if levels is None:
+            levels = GlucosePredictor.recent_levels(db, user_id)
         
-        if len(readings) < 5:
+        if levels.size < 5:
             return {
                 'risk_level': 'desconocido',
                 'risk_score': 0.0,
                 'message': 'Datos insuficientes para evaluación'
             }
         
-        levels = [r.glucose_level for r in readings]
-        
-        # Calculate statistics
-        avg_glucose = np.mean(levels)
-        std_dev = np.std(levels)
-        
-        # Count critical events
-        hypoglycemia = sum(1 for level in levels if level < 70)
-        hyperglycemia = sum(1 for level in levels if level > 180)
+        # Statistics and critical event counts
+        avg_glucose, std_dev, hypoglycemia, hyperglycemia = _risk_statistics(levels)
         
         # Calculate risk score (0-1)
         risk_score = 0.0
@@ -341,11 +540,21 @@ class GlucosePredictor:
             'hyperglycemia_events': hyperglycemia
         }
     
-    def get_recommendations(self, db: Session, user_id: int) -> List[str]:
+    @staticmethod
+    def get_recommendations(
+        db: Session,
+        user_id: int,
+        risk_data: Optional[Dict] = None
+    ) -> List[str]:
         """
         Generate personalized recommendations based on user's data.
+        
+        Args:
+            risk_data: Result of assess_risk() for this user, if the caller
+                already has it; otherwise it is computed here
         """
-        risk_data = self.assess_risk(db, user_id)
+        if risk_data is None:
+            risk_data = GlucosePredictor.assess_risk(db, user_id)
         recommendations = []
         
         # Based on average glucose
@@ -380,5 +589,35 @@ class GlucosePredictor:
         return recommendations
 
 
-# Global predictor instance
-predictor = GlucosePredictor()
+# Global predictor instance, created on first use (warmed up at startup)
+_predictor: Optional[GlucosePredictor] = None
+_predictor_lock = threading.Lock()
+
+# Set once the shared predictor has finished loading
+MODEL_READY = threading.Event()
+
+# Error message of a failed load (startup warm-up), None otherwise
+_model_load_error: Optional[str] = None
+
+
+def mark_model_load_failed(error: BaseException) -> None:
+    """Record that loading the shared predictor failed."""
+    global _model_load_error
+    _model_load_error = f"{type(error).__name__}: {error}"
+
+
+def model_load_error() -> Optional[str]:
+    """Why the shared predictor failed to load, if it did."""
+    return _model_load_error
+
+
+def get_predictor() -> GlucosePredictor:
+    """Return the shared predictor, loading the model on first access."""
+    global _predictor, _model_load_error
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                _predictor = GlucosePredictor()
+                _model_load_error = None
+                MODEL_READY.set()
+    return _predictor
@@ -14,7 +14,7 @@ class GlucoseReading(Base):
     __tablename__ = "glucose_readings"
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)  # Leading column of uq_reading_user_ts
     glucose_level = Column(Float, nullable=False)
     timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
     moment_of_day = Column(String(50), nullable=True)  # 'En Ayuno', 'Después de Desayuno', etc.
@@ -23,9 +23,15 @@ class GlucoseReading(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Composite index for efficient queries
+    # One reading per user and instant (the ON CONFLICT arbiter for sync). It also
+    # covers the recent-window columns, so "last N readings of a user" is an
+    # index-only backward scan
     __table_args__ = (
-        Index('idx_user_timestamp', 'user_id', 'timestamp'),
+        Index(
+            'uq_reading_user_ts', 'user_id', 'timestamp',
+            unique=True,
+            postgresql_include=['glucose_level', 'moment_of_day']
+        ),
     )
     
     def __repr__(self):
@@ -60,6 +66,8 @@ class Prediction(Base):
     
     __table_args__ = (
         Index('idx_user_prediction_time', 'user_id', 'prediction_for_timestamp'),
+        # Latest predictions per user (/predictions/history)
+        Index('idx_user_prediction_created', 'user_id', created_at.desc()),
     )
     
     def __repr__(self):
@@ -85,3 +93,30 @@ class SyncLog(Base):
     
     def __repr__(self):
         return f"<SyncLog(type={self.sync_type}, count={self.records_count}, status={self.status})>"
+
+
+class TrainingJob(Base):
+    """
+    Tracks model training runs started from /sync/train-model.
+    Training runs in the background; clients poll the job by id.
+    """
+    __tablename__ = "training_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, nullable=True)  # None = global model
+    status = Column(String(20), nullable=False)  # 'queued', 'running', 'success', 'insufficient_data', 'failed'
+    
+    # Results
+    samples_used = Column(Integer, nullable=True)
+    r2_score = Column(Float, nullable=True)
+    mae = Column(Float, nullable=True)
+    model_version = Column(String(50), nullable=True)
+    message = Column(String(500), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<TrainingJob(id={self.id}, user={self.user_id}, status={self.status})>"
@@ -2,18 +2,24 @@
 Prediction endpoints for glucose level forecasting
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import Iterator, List
+from datetime import datetime, timezone
+import orjson
 
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from ..schemas import (
     PredictionRequest, PredictionResponse, PredictionPoint,
     RiskAssessmentRequest, RiskAssessmentResponse,
     RecommendationResponse
 )
-from ..ml.predictor import predictor
-from ..models import GlucoseReading
+from ..ml.predictor import (
+    GlucosePredictor, get_predictor, MODEL_READY,
+    mark_model_load_failed, model_load_error
+)
+from ..models import Prediction
 
 router = APIRouter(
     prefix="/predictions",
@@ -21,10 +27,36 @@ router = APIRouter(
 )
 
 
-@router.post("/next-hours", response_model=PredictionResponse)
-async def predict_next_hours(
+def ready_predictor() -> GlucosePredictor:
+    """
+    Dependency returning the shared predictor.
+    
+    Responds 503 if the model is still warming up after a few seconds.
+    If the startup warm-up failed, retries the load instead of waiting.
+    """
+    if not MODEL_READY.is_set() and model_load_error() is not None:
+        try:
+            return get_predictor()
+        except Exception as e:
+            mark_model_load_failed(e)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Model failed to load: {model_load_error()}"
+            )
+    
+    if not MODEL_READY.wait(timeout=5):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model is warming up, please retry shortly"
+        )
+    return get_predictor()
+
+
+@router.post("/next-hours", response_model=PredictionResponse, response_class=ORJSONResponse)
+def predict_next_hours(
     request: PredictionRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    predictor: GlucosePredictor = Depends(ready_predictor)
 ):
     """
     Predict glucose levels for the next N hours.
@@ -35,22 +67,29 @@ async def predict_next_hours(
     Returns predictions with timestamps and confidence scores.
     """
     try:
+        loaded = predictor.loaded
         predictions = predictor.predict_next_hours(
             db=db,
             user_id=request.user_id,
-            hours_ahead=request.hours_ahead
+            hours_ahead=request.hours_ahead,
+            loaded=loaded
         )
         
+        # The predictor returns correctly typed values (datetime / float);
+        # build the models without re-running validation on them
         prediction_points = [
-            PredictionPoint(**pred) for pred in predictions
+            PredictionPoint.model_construct(**pred) for pred in predictions
         ]
         
-        return PredictionResponse(
+        response = PredictionResponse.model_construct(
             user_id=request.user_id,
             predictions=prediction_points,
-            model_version=predictor.model_version,
-            generated_at=datetime.now()
+            model_version=loaded.version,
+            generated_at=datetime.now(timezone.utc)
         )
+        # Send it straight to orjson instead of letting FastAPI re-validate
+        # and re-encode it against response_model
+        return ORJSONResponse(response.model_dump(mode='json'))
         
     except ValueError as e:
         raise HTTPException(
@@ -64,8 +103,8 @@ async def predict_next_hours(
         )
 
 
-@router.post("/risk-assessment", response_model=RiskAssessmentResponse)
-async def assess_risk(
+@router.post("/risk-assessment", response_model=RiskAssessmentResponse, response_class=ORJSONResponse)
+def assess_risk(
     request: RiskAssessmentRequest,
     db: Session = Depends(get_db)
 ):
@@ -75,14 +114,22 @@ async def assess_risk(
     - **user_id**: ID del usuario
     
     Returns risk level (bajo/medio/alto), statistics, and event counts.
+    Statistics only: doesn't wait for the model warm-up.
     """
     try:
-        risk_data = predictor.assess_risk(db=db, user_id=request.user_id)
+        # Window levels straight into a float64 array, no row objects
+        levels = GlucosePredictor.recent_levels(db, request.user_id)
+        risk_data = GlucosePredictor.assess_risk(db=db, user_id=request.user_id, levels=levels)
         
-        # Get recommendations
-        recommendations = predictor.get_recommendations(db=db, user_id=request.user_id)
+        # Get recommendations from the same statistics (no second window scan)
+        recommendations = GlucosePredictor.get_recommendations(
+            db=db,
+            user_id=request.user_id,
+            risk_data=risk_data
+        )
         
-        return RiskAssessmentResponse(
+        # risk_data holds plain Python floats/ints from assess_risk: skip validation
+        response = RiskAssessmentResponse.model_construct(
             user_id=request.user_id,
             risk_level=risk_data['risk_level'],
             risk_score=risk_data['risk_score'],
@@ -91,8 +138,9 @@ async def assess_risk(
             hypoglycemia_events=risk_data.get('hypoglycemia_events', 0),
             hyperglycemia_events=risk_data.get('hyperglycemia_events', 0),
             recommendations=recommendations,
-            generated_at=datetime.now()
+            generated_at=datetime.now(timezone.utc)
         )
+        return ORJSONResponse(response.model_dump(mode='json'))
         
     except Exception as e:
         raise HTTPException(
@@ -102,7 +150,7 @@ async def assess_risk(
 
 
 @router.get("/recommendations/{user_id}", response_model=RecommendationResponse)
-async def get_recommendations(
+def get_recommendations(
     user_id: int,
     db: Session = Depends(get_db)
 ):
@@ -110,20 +158,24 @@ async def get_recommendations(
     Get personalized recommendations for a user.
     
     - **user_id**: ID del usuario
+    
+    Statistics only: doesn't wait for the model warm-up.
     """
     try:
-        # Count readings used
-        count = db.query(GlucoseReading)\
-            .filter(GlucoseReading.user_id == user_id)\
-            .count()
-        
-        recommendations = predictor.get_recommendations(db=db, user_id=user_id)
+        # One query for both the statistics and the readings count
+        levels = GlucosePredictor.recent_levels(db, user_id)
+        risk_data = GlucosePredictor.assess_risk(db=db, user_id=user_id, levels=levels)
+        recommendations = GlucosePredictor.get_recommendations(
+            db=db,
+            user_id=user_id,
+            risk_data=risk_data
+        )
         
         return RecommendationResponse(
             user_id=user_id,
             recommendations=recommendations,
-            based_on_readings=count,
-            generated_at=datetime.now()
+            based_on_readings=int(levels.size),
+            generated_at=datetime.now(timezone.utc)
         )
         
     except Exception as e:
@@ -133,10 +185,59 @@ async def get_recommendations(
         )
 
 
-@router.get("/history/{user_id}")
-async def get_prediction_history(
+def _history_query(user_id: int, limit: int):
+    """Latest predictions of a user as plain columns (served by idx_user_prediction_created)."""
+    return (
+        select(
+            Prediction.id,
+            Prediction.predicted_level,
+            Prediction.prediction_for_timestamp.label('prediction_for'),
+            Prediction.confidence_score.label('confidence'),
+            Prediction.actual_level,
+            Prediction.created_at
+        )
+        .where(Prediction.user_id == user_id)
+        .order_by(Prediction.created_at.desc())
+        .limit(limit)
+    )
+
+
+def _stream_history(user_id: int, limit: int) -> Iterator[bytes]:
+    """
+    Yield history rows as NDJSON lines, fetching them in chunks.
+    
+    Opens its own session: the generator outlives the request's dependencies.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            _history_query(user_id, limit).execution_options(yield_per=100)
+        ).mappings()
+        for row in rows:
+            yield orjson.dumps(dict(row)) + b"\n"
+    finally:
+        db.close()
+
+
+@router.get(
+    "/history/{user_id}",
+    response_class=ORJSONResponse,
+    responses={
+        200: {
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id":1,"predicted_level":120.5,"prediction_for":"2024-01-01T10:00:00+00:00",'
+                               '"confidence":0.95,"actual_level":null,"created_at":"2024-01-01T09:00:00+00:00"}'
+                }
+            },
+            "description": "JSON object, or one prediction per line when stream=true"
+        }
+    }
+)
+def get_prediction_history(
     user_id: int,
     limit: int = 50,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -144,27 +245,21 @@ async def get_prediction_history(
     
     - **user_id**: ID del usuario
     - **limit**: Number of predictions to return (default 50)
+    - **stream**: If true, respond with NDJSON (`application/x-ndjson`), one
+      prediction object per line, streamed as rows are read
     """
-    from ..models import Prediction
+    if stream:
+        return StreamingResponse(
+            _stream_history(user_id, limit),
+            media_type="application/x-ndjson"
+        )
     
-    predictions = db.query(Prediction)\
-        .filter(Prediction.user_id == user_id)\
-        .order_by(Prediction.created_at.desc())\
-        .limit(limit)\
-        .all()
+    # Plain column rows as dicts: no ORM instances or identity map
+    predictions = db.execute(_history_query(user_id, limit)).mappings().all()
     
-    return {
+    # orjson encodes the datetimes natively; skip FastAPI's jsonable_encoder
+    return ORJSONResponse({
         'user_id': user_id,
         'count': len(predictions),
-        'predictions': [
-            {
-                'id': p.id,
-                'predicted_level': p.predicted_level,
-                'prediction_for': p.prediction_for_timestamp,
-                'confidence': p.confidence_score,
-                'actual_level': p.actual_level,
-                'created_at': p.created_at
-            }
-            for p in predictions
-        ]
-    }
+        'predictions': [dict(p) for p in predictions]
+    })
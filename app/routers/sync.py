@@ -1,27 +1,98 @@
 """
 Synchronization endpoints for data transfer from Java application
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timezone
+import threading
+from cachetools import TTLCache
 
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from ..schemas import (
     SyncSingleRequest, SyncBatchRequest, SyncResponse,
     GlucoseReadingCreate
 )
-from ..models import GlucoseReading, SyncLog
+from ..models import GlucoseReading, SyncLog, TrainingJob
+from ..ml.predictor import invalidate_user_cache
 
 router = APIRouter(
     prefix="/sync",
     tags=["synchronization"]
 )
 
+# Serializes background training runs within this process
+_training_lock = threading.Lock()
+
+# Reading insert shared by the batch and single-reading paths. Built once so
+# SQLAlchemy's compiled cache hits directly; psycopg then prepares it
+# server-side after a few executions (prepare_threshold). Duplicates on
+# (user_id, timestamp) are skipped, and RETURNING yields only inserted ids.
+_INSERT_READING = (
+    insert(GlucoseReading)
+    .on_conflict_do_nothing(index_elements=['user_id', 'timestamp'])
+    .returning(GlucoseReading.id)
+)
+
+# /sync/status aggregates; a few seconds of staleness is fine for a status view
+_status_cache: TTLCache = TTLCache(maxsize=1, ttl=10)
+_status_lock = threading.Lock()
+
+
+def _insert_new_readings(db: Session, readings: List[GlucoseReadingCreate]) -> int:
+    """
+    Store the readings that are not already in the database.
+    
+    Duplicates (same user_id and timestamp, in the batch or already stored)
+    are skipped by the uq_reading_user_ts unique index via ON CONFLICT DO NOTHING.
+    Does not commit. Returns the number of readings inserted.
+    """
+    # executemany + RETURNING: SQLAlchemy batches this into multi-row VALUES
+    # ("insertmanyvalues"). render_nulls keeps rows with and without
+    # moment_of_day in one batch.
+    mappings = [
+        {
+            'user_id': r.user_id,
+            'glucose_level': r.glucose_level,
+            'timestamp': r.timestamp,
+            'moment_of_day': r.moment_of_day
+        }
+        for r in readings
+    ]
+    result = db.execute(
+        _INSERT_READING,
+        mappings,
+        execution_options={"render_nulls": True}
+    )
+    return len(result.all())
+
+
+def _log_failed_sync(db: Session, sync_type: str, error: Exception) -> None:
+    """
+    Record a failed sync in its own short transaction (after a rollback).
+    
+    Best effort: if the log itself can't be written, the caller still
+    reports the original error.
+    """
+    now = datetime.now(timezone.utc)
+    db.add(SyncLog(
+        sync_type=sync_type,
+        records_count=0,
+        status="failed",
+        error_message=str(error)[:500],  # DBAPIError text embeds the SQL and params
+        started_at=now,
+        completed_at=now
+    ))
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+
 
 @router.post("/initial", response_model=SyncResponse)
-async def initial_sync(
+def initial_sync(
     request: SyncBatchRequest,
     db: Session = Depends(get_db)
 ):
@@ -36,66 +107,34 @@ async def initial_sync(
         records_count=0,
         status="in_progress"
     )
-    db.add(sync_log)
-    db.commit()
     
     try:
-        synced = 0
-        errors = []
+        # Log row and readings share one transaction; flush assigns sync_log.id
+        db.add(sync_log)
+        db.flush()
         
-        for reading_data in request.readings:
-            try:
-                # Check if reading already exists (avoid duplicates)
-                existing = db.query(GlucoseReading).filter(
-                    GlucoseReading.user_id == reading_data.user_id,
-                    GlucoseReading.timestamp == reading_data.timestamp
-                ).first()
-                
-                if existing:
-                    continue  # Skip duplicates
-                
-                # Create new reading
-                db_reading = GlucoseReading(
-                    user_id=reading_data.user_id,
-                    glucose_level=reading_data.glucose_level,
-                    timestamp=reading_data.timestamp,
-                    moment_of_day=reading_data.moment_of_day
-                )
-                db.add(db_reading)
-                synced += 1
-                
-                # Commit in batches of 100
-                if synced % 100 == 0:
-                    db.commit()
-                    
-            except Exception as e:
-                errors.append(f"Error on reading: {str(e)}")
-                continue
+        # Skip duplicates and store the rest in one bulk insert
+        synced = _insert_new_readings(db, request.readings)
         
-        # Final commit
-        db.commit()
-        
-        # Update sync log
+        # Update sync log and commit everything at once
         sync_log.records_count = synced
-        sync_log.status = "success" if not errors else "partial"
-        sync_log.completed_at = datetime.now()
-        if errors:
-            sync_log.error_message = "; ".join(errors[:5])  # First 5 errors
+        sync_log.status = "success"
+        sync_log.completed_at = datetime.now(timezone.utc)
+        sync_id = sync_log.id
         db.commit()
+        for user_id in {r.user_id for r in request.readings}:
+            invalidate_user_cache(user_id)
         
         return SyncResponse(
-            status=sync_log.status,
+            status="success",
             records_synced=synced,
-            errors=errors if errors else None,
-            sync_id=sync_log.id,
+            sync_id=sync_id,
             message=f"Successfully synced {synced} readings"
         )
         
     except Exception as e:
-        sync_log.status = "failed"
-        sync_log.error_message = str(e)
-        sync_log.completed_at = datetime.now()
-        db.commit()
+        db.rollback()
+        _log_failed_sync(db, "initial", e)
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -104,7 +143,7 @@ async def initial_sync(
 
 
 @router.post("/reading", response_model=SyncResponse)
-async def sync_single_reading(
+def sync_single_reading(
     request: SyncSingleRequest,
     db: Session = Depends(get_db)
 ):
@@ -114,42 +153,33 @@ async def sync_single_reading(
     Called automatically after each new reading is saved in Java application.
     """
     try:
-        # Check for duplicate
-        existing = db.query(GlucoseReading).filter(
-            GlucoseReading.user_id == request.user_id,
-            GlucoseReading.timestamp == request.timestamp
-        ).first()
+        # One round-trip: the unique constraint detects duplicates and
+        # RETURNING yields no row when the reading already exists
+        reading_id = db.execute(
+            _INSERT_READING,
+            {
+                'user_id': request.user_id,
+                'glucose_level': request.glucose_level,
+                'timestamp': request.timestamp,
+                'moment_of_day': request.moment_of_day
+            }
+        ).scalar()
         
-        if existing:
+        if reading_id is None:
+            db.rollback()
             return SyncResponse(
                 status="duplicate",
                 records_synced=0,
                 message="Reading already exists"
             )
         
-        # Create new reading
-        db_reading = GlucoseReading(
-            user_id=request.user_id,
-            glucose_level=request.glucose_level,
-            timestamp=request.timestamp,
-            moment_of_day=request.moment_of_day
-        )
-        db.add(db_reading)
         db.commit()
-        db.refresh(db_reading)
+        invalidate_user_cache(request.user_id)
         
         return SyncResponse(
             status="success",
             records_synced=1,
-            message=f"Reading synced successfully (ID: {db_reading.id})"
-        )
-        
-    except IntegrityError:
-        db.rollback()
-        return SyncResponse(
-            status="duplicate",
-            records_synced=0,
-            message="Reading already exists (integrity constraint)"
+            message=f"Reading synced successfully (ID: {reading_id})"
         )
         
     except Exception as e:
@@ -161,7 +191,7 @@ async def sync_single_reading(
 
 
 @router.post("/batch", response_model=SyncResponse)
-async def sync_batch_readings(
+def sync_batch_readings(
     request: SyncBatchRequest,
     db: Session = Depends(get_db)
 ):
@@ -175,58 +205,33 @@ async def sync_batch_readings(
         records_count=0,
         status="in_progress"
     )
-    db.add(sync_log)
-    db.commit()
     
     try:
-        synced = 0
-        errors = []
+        # Log row and readings share one transaction; flush assigns sync_log.id
+        db.add(sync_log)
+        db.flush()
         
-        for reading_data in request.readings:
-            try:
-                # Check for duplicate
-                existing = db.query(GlucoseReading).filter(
-                    GlucoseReading.user_id == reading_data.user_id,
-                    GlucoseReading.timestamp == reading_data.timestamp
-                ).first()
-                
-                if existing:
-                    continue
-                
-                db_reading = GlucoseReading(
-                    user_id=reading_data.user_id,
-                    glucose_level=reading_data.glucose_level,
-                    timestamp=reading_data.timestamp,
-                    moment_of_day=reading_data.moment_of_day
-                )
-                db.add(db_reading)
-                synced += 1
-                
-            except Exception as e:
-                errors.append(str(e))
-                continue
+        synced = _insert_new_readings(db, request.readings)
         
-        db.commit()
-        
-        # Update sync log
+        # Update sync log and commit everything at once
         sync_log.records_count = synced
         sync_log.status = "success"
-        sync_log.completed_at = datetime.now()
+        sync_log.completed_at = datetime.now(timezone.utc)
+        sync_id = sync_log.id
         db.commit()
+        for user_id in {r.user_id for r in request.readings}:
+            invalidate_user_cache(user_id)
         
         return SyncResponse(
             status="success",
             records_synced=synced,
-            errors=errors if errors else None,
-            sync_id=sync_log.id,
+            sync_id=sync_id,
             message=f"Batch sync completed: {synced} readings"
         )
         
     except Exception as e:
-        sync_log.status = "failed"
-        sync_log.error_message = str(e)
-        sync_log.completed_at = datetime.now()
-        db.commit()
+        db.rollback()
+        _log_failed_sync(db, "batch", e)
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -234,8 +239,19 @@ async def sync_batch_readings(
         )
 
 
+def _total_readings(db: Session) -> int:
+    """Row count of glucose_readings, cached for a few seconds (count(*) scans the table)."""
+    with _status_lock:
+        total = _status_cache.get('total_readings')
+    if total is None:
+        total = db.execute(select(func.count()).select_from(GlucoseReading)).scalar()
+        with _status_lock:
+            _status_cache['total_readings'] = total
+    return total
+
+
 @router.get("/status")
-async def get_sync_status(db: Session = Depends(get_db)):
+def get_sync_status(db: Session = Depends(get_db)):
     """
     Get status of recent synchronization operations.
     """
@@ -244,7 +260,7 @@ async def get_sync_status(db: Session = Depends(get_db)):
         .limit(10)\
         .all()
     
-    total_readings = db.query(GlucoseReading).count()
+    total_readings = _total_readings(db)
     
     return {
         'total_readings_stored': total_readings,
@@ -262,26 +278,93 @@ async def get_sync_status(db: Session = Depends(get_db)):
     }
 
 
-@router.post("/train-model")
-async def trigger_model_training(
-    user_id: int = None,
+def _run_training_job(job_id: int, user_id: Optional[int]) -> None:
+    """
+    Background task: train the shared model and record the outcome on the job.
+    
+    Uses its own session, since the request's session is closed by then.
+    Runs one training at a time per process.
+    """
+    from ..ml.predictor import get_predictor
+    
+    with _training_lock:
+        db = SessionLocal()
+        try:
+            job = db.get(TrainingJob, job_id)
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            db.commit()
+            
+            try:
+                result = get_predictor().train(db=db, user_id=user_id)
+            except Exception as e:
+                db.rollback()
+                job.status = "failed"
+                job.message = str(e)[:500]
+            else:
+                job.status = result['status']
+                job.message = result.get('message')
+                if result['status'] == 'success':
+                    job.samples_used = result['samples_used']
+                    job.r2_score = float(result['r2_score'])
+                    job.mae = float(result['mae'])
+                    job.model_version = result['model_version']
+            
+            job.completed_at = datetime.now(timezone.utc)
+            db.commit()
+        finally:
+            db.close()
+
+
+@router.post("/train-model", status_code=status.HTTP_202_ACCEPTED)
+def trigger_model_training(
+    background_tasks: BackgroundTasks,
+    user_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Manually trigger model training.
+    Queue a model training run and return immediately.
     
     - **user_id**: Optional. If provided, trains personalized model for this user.
     
+    Poll `GET /sync/train-model/{job_id}` for the result.
     This can be called periodically to retrain the model with new data.
     """
-    from ..ml.predictor import predictor
+    job = TrainingJob(user_id=user_id, status="queued")
+    db.add(job)
+    db.commit()
+    job_id = job.id
     
-    try:
-        result = predictor.train(db=db, user_id=user_id)
-        return result
-        
-    except Exception as e:
+    background_tasks.add_task(_run_training_job, job_id, user_id)
+    
+    return {
+        'job_id': job_id,
+        'status': "queued"
+    }
+
+
+@router.get("/train-model/{job_id}")
+def get_training_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Get the status and metrics of a training job.
+    """
+    job = db.get(TrainingJob, job_id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Training failed: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Training job {job_id} not found"
         )
+    
+    return {
+        'job_id': job.id,
+        'user_id': job.user_id,
+        'status': job.status,
+        'samples_used': job.samples_used,
+        'r2_score': job.r2_score,
+        'mae': job.mae,
+        'model_version': job.model_version,
+        'message': job.message,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'completed_at': job.completed_at
+    }
@@ -1,17 +1,26 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Annotated, Optional, List
+
+
+# ============== Reusable field types ==============
+
+# Constraints compile into the field's pydantic-core validator (no Python hooks)
+UserId = Annotated[int, Field(gt=0, description="User ID from Java application")]
+GlucoseLevel = Annotated[float, Field(gt=0, lt=1000, description="Glucose level in mg/dL")]
 
 
 # ============== Glucose Reading Schemas ==============
 
 class GlucoseReadingBase(BaseModel):
     """Base schema for glucose reading"""
-    user_id: int = Field(..., gt=0, description="User ID from Java application")
-    glucose_level: float = Field(..., gt=0, lt=1000, description="Glucose level in mg/dL")
+    model_config = ConfigDict(from_attributes=True)
+    
+    user_id: UserId
+    glucose_level: GlucoseLevel
     timestamp: datetime = Field(..., description="When the reading was taken")
     moment_of_day: Optional[str] = Field(None, max_length=50, description="Context: 'En Ayuno', etc.")
 
@@ -25,9 +34,6 @@ class GlucoseReadingResponse(GlucoseReadingBase):
     """Schema for glucose reading response"""
     id: int
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
 
 
 # ============== Prediction Schemas ==============
@@ -36,12 +42,6 @@ class PredictionRequest(BaseModel):
     """Request schema for getting predictions"""
     user_id: int = Field(..., gt=0)
     hours_ahead: int = Field(6, ge=1, le=24, description="How many hours to predict (1-24)")
-    
-    @validator('hours_ahead')
-    def validate_hours(cls, v):
-        if v < 1 or v > 24:
-            raise ValueError('hours_ahead must be between 1 and 24')
-        return v
 
 
 class PredictionPoint(BaseModel):
@@ -59,9 +59,7 @@ class PredictionResponse(BaseModel):
     generated_at: datetime
     message: Optional[str] = None
     
-    model_config = {
-        "protected_namespaces": ()
-    }
+    model_config = ConfigDict(protected_namespaces=())
 
 
 # ============== Risk Assessment Schemas ==============
@@ -133,6 +131,4 @@ class HealthResponse(BaseModel):
     model_loaded: bool
     timestamp: datetime
     
-    model_config = {
-        "protected_namespaces": ()
-    }
+    model_config = ConfigDict(protected_namespaces=())